@@ -1,11 +1,18 @@
 from __future__ import annotations
 
 import asyncio
+import contextlib
+import hashlib
 import io
+import os
 import zipfile
+from collections import OrderedDict
+from concurrent.futures import Executor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from functools import lru_cache
-from typing import Dict
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Set, Tuple, Union
 
+import numpy as np
 from fastapi import FastAPI, HTTPException
 from fastapi.responses import StreamingResponse
 
@@ -14,17 +21,73 @@ from .models import (
     WatermarkRemovalResponse,
     WatermarkedImageResult,
     WatermarkRegion,
+    _default_device,
 )
 from .services import (
+    InferenceUnavailableError,
     LamaWatermarkRemover,
     WatermarkRemovalError,
-    image_to_base64,
+    bytes_to_base64,
+    create_http_client,
+    create_inference_process_pool,
+    download_images,
     image_to_bytes,
-    remove_watermark_from_url,
+    inpaint_images,
+    warm_up_process_pool,
 )
 
 
-app = FastAPI(title="Watermark Removal API", version="1.0.0")
+LAMA_PREWARM = os.getenv("LAMA_PREWARM", "1") == "1"
+LAMA_CPU_WORKERS = int(os.getenv("LAMA_CPU_WORKERS", str((os.cpu_count() or 2) // 2)))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    loop = asyncio.get_running_loop()
+    # Decode/encode share a CPU-sized pool; LaMa gets its own single worker so model
+    # calls are serialized on the device and never queue behind image codecs.
+    app.state.cpu_executor = ThreadPoolExecutor(
+        max_workers=os.cpu_count(), thread_name_prefix="watermark-cpu"
+    )
+    app.state.gpu_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="watermark-lama")
+    # CPU inference holds the GIL for much of the forward pass, so it runs in worker processes.
+    app.state.cpu_process_pool = None
+    device = _default_device()
+    if device == "cpu" and LAMA_CPU_WORKERS > 0:
+        app.state.cpu_process_pool = create_inference_process_pool(device, LAMA_CPU_WORKERS)
+    loop.set_default_executor(app.state.cpu_executor)
+    app.state.http_client = create_http_client()
+    try:
+        if LAMA_PREWARM:
+            if app.state.cpu_process_pool is not None:
+                await warm_up_process_pool(app.state.cpu_process_pool, LAMA_CPU_WORKERS)
+            else:
+                remover = _remover_for_device(device)
+                await loop.run_in_executor(app.state.gpu_executor, remover.warm_up)
+        yield
+    finally:
+        await app.state.http_client.aclose()
+        app.state.gpu_executor.shutdown(wait=False)
+        if app.state.cpu_process_pool is not None:
+            app.state.cpu_process_pool.shutdown(wait=False, cancel_futures=True)
+
+
+app = FastAPI(title="Watermark Removal API", version="1.0.0", lifespan=lifespan)
+
+_MEDIA_TYPES = {"png": "image/png", "jpeg": "image/jpeg", "webp": "image/webp"}
+_EXTENSIONS = {"png": "png", "jpeg": "jpg", "webp": "webp"}
+
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "32"))
+
+ResultKey = Tuple[str, int, int, int, int, str, str]
+Pending = Tuple[ResultKey, "asyncio.Future[bytes]"]
+
+_result_cache: "OrderedDict[ResultKey, bytes]" = OrderedDict()
+_inflight: Dict[ResultKey, "asyncio.Future[bytes]"] = {}
+# Number of requests currently awaiting each in-flight key.
+_waiters: Dict[ResultKey, int] = {}
+_batches: Set["asyncio.Task[None]"] = set()
+_inflight_lock = asyncio.Lock()
 
 
 @lru_cache(maxsize=2)
@@ -32,6 +95,252 @@ def _remover_for_device(device: str) -> LamaWatermarkRemover:
     return LamaWatermarkRemover(device=device)
 
 
+def _inference_executor(device: str) -> Optional[Executor]:
+    process_pool = getattr(app.state, "cpu_process_pool", None)
+    if device == "cpu" and process_pool is not None:
+        return process_pool
+    return getattr(app.state, "gpu_executor", None)
+
+
+def _replace_broken_process_pool(broken: Optional[Executor]) -> None:
+    # Only the first batch to hit a broken pool replaces it; later ones see the new pool.
+    if broken is None or getattr(app.state, "cpu_process_pool", None) is not broken:
+        return
+    pool = create_inference_process_pool(_default_device(), LAMA_CPU_WORKERS)
+    app.state.cpu_process_pool = pool
+    broken.shutdown(wait=False, cancel_futures=True)
+    if LAMA_PREWARM:
+        asyncio.ensure_future(warm_up_process_pool(pool, LAMA_CPU_WORKERS))
+
+
+def _result_key(url: str, region: WatermarkRegion, device: str, image_format: str) -> ResultKey:
+    url_hash = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    return (
+        url_hash,
+        region.width,
+        region.height,
+        region.offset_x,
+        region.offset_y,
+        device,
+        image_format,
+    )
+
+
+def _clear_result_cache() -> None:
+    _result_cache.clear()
+    _inflight.clear()
+    _waiters.clear()
+
+
+def _store_result(key: ResultKey, encoded: bytes) -> None:
+    if RESULT_CACHE_SIZE > 0:
+        _result_cache[key] = encoded
+        while len(_result_cache) > RESULT_CACHE_SIZE:
+            _result_cache.popitem(last=False)
+
+
+def _settle(
+    key: ResultKey, future: "asyncio.Future[bytes]", outcome: Union[bytes, BaseException]
+) -> None:
+    if _inflight.get(key) is future:
+        del _inflight[key]
+    if future.done():
+        return
+    if isinstance(outcome, BaseException):
+        future.set_exception(outcome)
+    else:
+        _store_result(key, outcome)
+        future.set_result(outcome)
+
+
+def _discard(key: ResultKey, future: "asyncio.Future[bytes]") -> None:
+    # Nobody is waiting any more; later requests for this key start a fresh batch.
+    if _inflight.get(key) is future:
+        del _inflight[key]
+    future.cancel()
+
+
+async def _clean_and_encode(
+    urls: List[str],
+    region: WatermarkRegion,
+    remover: LamaWatermarkRemover,
+    device: str,
+    image_format: str,
+    batch: List[Pending],
+) -> None:
+    client = getattr(app.state, "http_client", None)
+    images: Dict[int, np.ndarray] = {}
+    async with contextlib.aclosing(download_images(urls, client)) as downloads:
+        async for index, image in downloads:
+            if isinstance(image, BaseException):
+                # Fail this URL's requests now rather than after the rest of the batch.
+                _settle(*batch[index], image)
+            else:
+                images[index] = image
+
+    # Skip inference for URLs whose requests have all failed or gone away meanwhile.
+    wanted = []
+    for index in sorted(images):
+        if _waiters.get(batch[index][0]):
+            wanted.append(index)
+        else:
+            _discard(*batch[index])
+    if not wanted:
+        return
+
+    executor = _inference_executor(device)
+    try:
+        cleaned = await inpaint_images(
+            [urls[index] for index in wanted],
+            [images[index] for index in wanted],
+            region,
+            remover,
+            executor,
+        )
+    except InferenceUnavailableError:
+        _replace_broken_process_pool(executor)
+        raise
+    loop = asyncio.get_running_loop()
+    encoded = await asyncio.gather(
+        *(loop.run_in_executor(None, image_to_bytes, image, image_format) for image in cleaned)
+    )
+    for index, data in zip(wanted, encoded):
+        _settle(*batch[index], data)
+
+
+async def _clean_and_encode_batch(
+    urls: List[str],
+    region: WatermarkRegion,
+    remover: LamaWatermarkRemover,
+    device: str,
+    image_format: str,
+    batch: List[Pending],
+) -> None:
+    try:
+        await _clean_and_encode(urls, region, remover, device, image_format, batch)
+    except Exception as exc:  # noqa: BLE001 - every waiting request gets the batch's error
+        for key, future in batch:
+            _settle(key, future, exc)
+    finally:
+        for key, future in batch:
+            _discard(key, future)
+
+
+async def _cleaned_bytes(
+    urls: List[str],
+    region: WatermarkRegion,
+    remover: LamaWatermarkRemover,
+    device: str,
+    image_format: str,
+) -> List[bytes]:
+    keys = [_result_key(url, region, device, image_format) for url in urls]
+    results: Dict[int, bytes] = {}
+    waiting: Dict[int, "asyncio.Future[bytes]"] = {}
+
+    async with _inflight_lock:
+        loop = asyncio.get_running_loop()
+        batch: List[Pending] = []
+        batch_urls = []
+        for index, key in enumerate(keys):
+            cached = _result_cache.get(key)
+            if cached is not None:
+                _result_cache.move_to_end(key)
+                results[index] = cached
+                continue
+            future = _inflight.get(key)
+            if future is None:
+                future = _inflight[key] = loop.create_future()
+                batch.append((key, future))
+                batch_urls.append(urls[index])
+            waiting[index] = future
+            _waiters[key] = _waiters.get(key, 0) + 1
+
+        # Everything not cached or already in flight is inpainted in a single batch.
+        if batch:
+            task = asyncio.ensure_future(
+                _clean_and_encode_batch(batch_urls, region, remover, device, image_format, batch)
+            )
+            _batches.add(task)
+            task.add_done_callback(_batches.discard)
+
+    try:
+        if waiting:
+            # Each URL settles on its own, so the first failure fails this request at once,
+            # and shielding keeps one cancelled client from aborting the work for others.
+            finished = await asyncio.gather(*(asyncio.shield(f) for f in waiting.values()))
+            results.update(zip(waiting, finished))
+    finally:
+        for index in waiting:
+            key = keys[index]
+            _waiters[key] -= 1
+            if not _waiters[key]:
+                del _waiters[key]
+
+    return [results[index] for index in range(len(urls))]
+
+
+class _ZipStream:
+    # zipfile writes an entry's local header, then its data, then seeks back to patch the
+    # header with the final CRC and sizes. Keeping the pending entry as a list of chunks
+    # supports exactly that without copying the already-encoded image bytes.
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+        self._drained = 0
+        self._size = 0
+        self._position = 0
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, position: int, whence: int = io.SEEK_SET) -> int:
+        if whence != io.SEEK_SET or position < self._drained:
+            raise io.UnsupportedOperation("can only seek within the pending entry")
+        self._position = position
+        return position
+
+    def write(self, data: bytes) -> int:
+        if not data:
+            return 0
+        end = self._drained + self._size
+        if self._position == end:
+            self._chunks.append(data)
+            self._size += len(data)
+        else:
+            self._overwrite(data)
+        self._position += len(data)
+        return len(data)
+
+    def _overwrite(self, data: bytes) -> None:
+        start = self._drained
+        for index, chunk in enumerate(self._chunks):
+            if start == self._position and len(chunk) == len(data):
+                self._chunks[index] = data
+                return
+            start += len(chunk)
+        raise io.UnsupportedOperation("can only rewrite a previously written chunk")
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> List[bytes]:
+        chunks, self._chunks = self._chunks, []
+        self._drained += self._size
+        self._size = 0
+        return chunks
+
+
+def _zip_chunks(entries: List[Tuple[str, bytes]]) -> Iterator[bytes]:
+    # The sink is seekable within the pending entry, so zipfile records each entry's size
+    # and CRC in its local header (no data descriptors), and each entry goes out as soon as
+    # it is written instead of buffering the whole archive.
+    stream = _ZipStream()
+    with zipfile.ZipFile(stream, "w", zipfile.ZIP_STORED) as archive:
+        for name, data in entries:
+            archive.writestr(name, data)
+            yield from stream.drain()
+    yield from stream.drain()
+
+
 @app.get("/healthz", summary="Health check")
 async def healthcheck() -> Dict[str, str]:
     return {"status": "ok"}
@@ -46,38 +355,52 @@ async def remove_watermark(request: WatermarkRemovalRequest) -> WatermarkRemoval
     remover = _remover_for_device(request.device)
     urls = [str(url) for url in request.images]
     region: WatermarkRegion = request.watermark
+    image_format = request.image_format
 
-    tasks = [remove_watermark_from_url(url, region, remover) for url in urls]
+    # Duplicate URLs in one batch share a single fetch + inpaint + encode.
+    indices_by_url: Dict[str, List[int]] = {}
+    for index, url in enumerate(urls):
+        indices_by_url.setdefault(url, []).append(index)
 
     try:
-        cleaned_images = await asyncio.gather(*tasks)
+        unique_results = await _cleaned_bytes(
+            list(indices_by_url), region, remover, request.device, image_format
+        )
     except WatermarkRemovalError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
+    except InferenceUnavailableError as exc:
+        raise HTTPException(status_code=503, detail=str(exc)) from exc
+
+    encoded_images: List[bytes] = [b""] * len(urls)
+    for indices, encoded in zip(indices_by_url.values(), unique_results):
+        for index in indices:
+            encoded_images[index] = encoded
 
     if request.response_format == "base64":
         results = [
-            WatermarkedImageResult(source_url=url, cleaned_image_base64=image_to_base64(image))
-            for url, image in zip(urls, cleaned_images)
+            WatermarkedImageResult(
+                source_url=url,
+                cleaned_image_base64=bytes_to_base64(encoded),
+            )
+            for url, encoded in zip(urls, encoded_images)
         ]
         return WatermarkRemovalResponse(results=results)
 
-    if len(cleaned_images) == 1:
-        image_bytes = image_to_bytes(cleaned_images[0])
-        filename = "cleaned.png"
+    extension = _EXTENSIONS[image_format]
+    if len(encoded_images) == 1:
+        filename = f"cleaned.{extension}"
         return StreamingResponse(
-            io.BytesIO(image_bytes),
-            media_type="image/png",
+            io.BytesIO(encoded_images[0]),
+            media_type=_MEDIA_TYPES[image_format],
             headers={"Content-Disposition": f"attachment; filename={filename}"},
         )
 
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as archive:
-        for index, image in enumerate(cleaned_images, start=1):
-            archive.writestr(f"cleaned_{index}.png", image_to_bytes(image))
-    zip_buffer.seek(0)
-
+    entries = [
+        (f"cleaned_{index}.{extension}", encoded)
+        for index, encoded in enumerate(encoded_images, start=1)
+    ]
     return StreamingResponse(
-        zip_buffer,
+        _zip_chunks(entries),
         media_type="application/zip",
         headers={"Content-Disposition": "attachment; filename=cleaned_images.zip"},
     )
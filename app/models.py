@@ -29,6 +29,10 @@ class WatermarkRemovalRequest(BaseModel):
     response_format: Literal["base64", "file"] = Field(
         "base64", description="Return base64 JSON payload or downloadable file(s)"
     )
+    image_format: Optional[Literal["png", "jpeg", "webp"]] = Field(
+        None,
+        description="Encoding for cleaned images; defaults to jpeg for base64 and png for files",
+    )
 
     @model_validator(mode="before")
     @classmethod
@@ -44,6 +48,12 @@ class WatermarkRemovalRequest(BaseModel):
             values["images"] = [images]
         return values
 
+    @model_validator(mode="after")
+    def _default_image_format(self):
+        if self.image_format is None:
+            self.image_format = "jpeg" if self.response_format == "base64" else "png"
+        return self
+
 
 class WatermarkedImageResult(BaseModel):
     source_url: HttpUrl
@@ -1,22 +1,69 @@
 from __future__ import annotations
 
 import asyncio
-import base64
+import contextlib
 import io
+import os
 import threading
-from typing import Callable, Optional
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import AsyncIterator, Callable, List, Optional, Sequence, Union
 
 import httpx
 import numpy as np
-from PIL import Image, ImageDraw
+import xxhash
+from cachetools import LRUCache
+from PIL import Image
 
 from .models import WatermarkRegion
 
+try:
+    import cv2
+except ImportError:  # pragma: no cover - OpenCV is optional, PIL is the fallback encoder
+    cv2 = None
+
+try:
+    from numba import njit
+except ImportError:  # pragma: no cover - Numba is optional, NumPy is the fallback blender
+    njit = None
+
+try:
+    import pybase64 as _b64
+except ImportError:  # pragma: no cover - SIMD base64 is optional, stdlib is the fallback
+    import base64 as _b64
+
+
+PNG_COMPRESSION_LEVEL = int(os.getenv("PNG_COMPRESSION_LEVEL", "1"))
+LAMA_BATCH_SIZE = int(os.getenv("LAMA_BATCH_SIZE", "8"))
+LAMA_CROP_CONTEXT = int(os.getenv("LAMA_CROP_CONTEXT", "256"))
+FETCH_CONCURRENCY = int(os.getenv("FETCH_CONCURRENCY", "8"))
+LAMA_CUDA_DTYPE = os.getenv("LAMA_CUDA_DTYPE", "float16")
+ENCODE_CACHE_BYTES = int(os.getenv("ENCODE_CACHE_BYTES", str(64 * 1024 * 1024)))
+
+_SAVE_OPTIONS = {
+    "PNG": {"compress_level": PNG_COMPRESSION_LEVEL},
+    "JPEG": {"quality": 85, "optimize": False},
+    "WEBP": {"quality": 85, "method": 4},
+}
+
+if cv2 is not None:
+    _CV2_ENCODE_OPTIONS = {
+        "PNG": (".png", [cv2.IMWRITE_PNG_COMPRESSION, PNG_COMPRESSION_LEVEL]),
+        "JPEG": (".jpg", [cv2.IMWRITE_JPEG_QUALITY, 85]),
+        "WEBP": (".webp", [cv2.IMWRITE_WEBP_QUALITY, 85]),
+    }
+else:  # pragma: no cover - exercised only without OpenCV
+    _CV2_ENCODE_OPTIONS = {}
+
 
 class WatermarkRemovalError(Exception):
     pass
 
 
+class InferenceUnavailableError(Exception):
+    pass
+
+
 def _default_model_factory(device: str):
     try:
         from simple_lama_inpainting import SimpleLama
@@ -28,7 +75,11 @@ def _default_model_factory(device: str):
     return SimpleLama(device=device)
 
 
-def create_mask(image_size: tuple[int, int], region: WatermarkRegion) -> Image.Image:
+ImageLike = Union[np.ndarray, Image.Image]
+MaskLike = Union[np.ndarray, Image.Image]
+
+
+def create_mask(image_size: tuple[int, int], region: WatermarkRegion) -> Optional[np.ndarray]:
     width, height = image_size
     rect_width = min(region.width, width)
     rect_height = min(region.height, height)
@@ -36,23 +87,217 @@ def create_mask(image_size: tuple[int, int], region: WatermarkRegion) -> Image.I
     bottom = height - region.offset_y
     left = max(0, right - rect_width)
     top = max(0, bottom - rect_height)
+    if right <= left or bottom <= top:
+        # The region lies entirely outside the image; there is nothing to inpaint.
+        return None
 
-    mask = Image.new("L", (width, height), 0)
-    draw = ImageDraw.Draw(mask)
-    draw.rectangle([(left, top), (right, bottom)], fill=255)
+    mask = np.zeros((height, width), dtype=np.uint8)
+    mask[top:bottom, left:right] = 255
     return mask
 
 
+def _rgb_array(image: ImageLike) -> np.ndarray:
+    if isinstance(image, np.ndarray):
+        return image
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    return np.asarray(image)
+
+
+def _as_pil(image: ImageLike) -> Image.Image:
+    if isinstance(image, Image.Image):
+        return image
+    return Image.fromarray(image)
+
+
+def _mask_array(mask: MaskLike) -> np.ndarray:
+    if isinstance(mask, np.ndarray):
+        return mask
+    return np.asarray(mask.convert("L"))
+
+
+def _round_up(value: int, multiple: int = 8) -> int:
+    return -(-value // multiple) * multiple
+
+
+BoundingBox = tuple[int, int, int, int]
+
+
+def _expand_span(start: int, end: int, pad: int, limit: int) -> tuple[int, int]:
+    start = max(0, start - pad)
+    end = min(limit, end + pad)
+    target = _round_up(end - start)
+    end = min(limit, start + target)
+    start = max(0, end - target)
+    return start, end
+
+
+def _crop_with_context(
+    image: np.ndarray, mask: np.ndarray, pad: int = LAMA_CROP_CONTEXT
+) -> tuple[np.ndarray, np.ndarray, BoundingBox]:
+    height, width = mask.shape
+    rows = np.flatnonzero(mask.any(axis=1))
+    cols = np.flatnonzero(mask.any(axis=0))
+    if rows.size == 0:
+        return image, mask, (0, 0, width, height)
+
+    # LaMa only needs the masked rectangle plus some surrounding context, so its cost
+    # scales with the watermark size rather than the whole image.
+    y0, y1 = _expand_span(int(rows[0]), int(rows[-1]) + 1, pad, height)
+    x0, x1 = _expand_span(int(cols[0]), int(cols[-1]) + 1, pad, width)
+    crop = np.ascontiguousarray(image[y0:y1, x0:x1])
+    crop_mask = np.ascontiguousarray(mask[y0:y1, x0:x1])
+    return crop, crop_mask, (x0, y0, x1, y1)
+
+
+def _blend_numpy(
+    orig: np.ndarray, inpainted: np.ndarray, mask: np.ndarray, out: np.ndarray
+) -> None:
+    weight = mask[..., None].astype(np.float32) / 255.0
+    out[...] = (orig * (1.0 - weight) + inpainted * weight + 0.5).astype(np.uint8)
+
+
+if njit is not None:
+
+    # Serial on purpose: the crop is small, and a parallel kernel on Numba's workqueue
+    # threading layer aborts the process when two threads call it at once.
+    @njit(fastmath=True, cache=True)
+    def _feather_blend(orig, inpainted, mask, out):
+        height, width, channels = out.shape
+        for y in range(height):
+            for x in range(width):
+                weight = mask[y, x] / 255.0
+                for c in range(channels):
+                    value = orig[y, x, c] * (1.0 - weight) + inpainted[y, x, c] * weight
+                    out[y, x, c] = np.uint8(value + 0.5)
+
+else:  # pragma: no cover - exercised only without Numba
+    _feather_blend = _blend_numpy
+
+
+def _paste(
+    image: np.ndarray, patch: np.ndarray, mask: np.ndarray, bbox: BoundingBox
+) -> np.ndarray:
+    # LaMa may alter pixels outside the mask, so blend by mask weight in a single pass
+    # instead of copying the patch wholesale: unmasked pixels stay exactly as they were.
+    x0, y0, x1, y1 = bbox
+    region = image[y0:y1, x0:x1]
+    _feather_blend(region, patch[: y1 - y0, : x1 - x0], mask, region)
+    return image
+
+
+def _pad_to(
+    array: np.ndarray, height: int, width: int, mode: str = "symmetric"
+) -> np.ndarray:
+    if array.shape[:2] == (height, width):
+        return array
+    padding = [(0, height - array.shape[0]), (0, width - array.shape[1])]
+    padding += [(0, 0)] * (array.ndim - 2)
+    return np.pad(array, padding, mode=mode)
+
+
+def _autocast(device: str) -> contextlib.AbstractContextManager:
+    if not str(device).startswith("cuda") or LAMA_CUDA_DTYPE == "float32":
+        return contextlib.nullcontext()
+
+    import torch
+
+    # Autocast keeps the FFT blocks in float32 (cuFFT half precision needs power-of-two
+    # sizes) while convolutions run on tensor cores in reduced precision.
+    return torch.autocast("cuda", dtype=getattr(torch, LAMA_CUDA_DTYPE))
+
+
+class _InferenceBuffers:
+    def __init__(self) -> None:
+        self._buffers: dict = {}
+        self.lock = threading.Lock()
+
+    def get(self, name: str, shape: tuple[int, ...], dtype, device, pin_memory: bool = False):
+        import torch
+
+        # Flat storage viewed to the requested shape stays contiguous for every (N, H, W);
+        # it is only reallocated when an input larger than anything seen so far arrives.
+        numel = int(np.prod(shape))
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.numel() < numel:
+            buffer = torch.empty(numel, dtype=dtype, device=device, pin_memory=pin_memory)
+            self._buffers[name] = buffer
+        return buffer[:numel].view(shape)
+
+
+def _forward_batch(
+    network,
+    device: str,
+    images: Sequence[np.ndarray],
+    masks: Sequence[np.ndarray],
+    buffers: _InferenceBuffers,
+) -> List[np.ndarray]:
+    import torch
+
+    count = len(images)
+    height = _round_up(max(image.shape[0] for image in images))
+    width = _round_up(max(image.shape[1] for image in images))
+    on_cuda = str(device).startswith("cuda")
+
+    image_shape = (count, height, width, 3)
+    mask_shape = (count, height, width)
+
+    with buffers.lock, torch.inference_mode():
+        host_images = buffers.get("host_images", image_shape, torch.uint8, "cpu", on_cuda)
+        host_masks = buffers.get("host_masks", mask_shape, torch.uint8, "cpu", on_cuda)
+        # Pad every image to a shared, 8-aligned size the same way SimpleLama pads a single image.
+        # Masks are mirrored only up to their own 8-alignment; beyond that a mirrored mask would
+        # grow the hole of a small image batched with larger ones, so the rest is left unmasked.
+        host_images_np = host_images.numpy()
+        host_masks_np = host_masks.numpy()
+        for index, (image, mask) in enumerate(zip(images, masks)):
+            own_mask = _pad_to(mask, _round_up(mask.shape[0]), _round_up(mask.shape[1]))
+            host_images_np[index] = _pad_to(image, height, width)
+            host_masks_np[index] = _pad_to(own_mask, height, width, mode="constant")
+
+        device_images, device_masks = host_images, host_masks
+        if on_cuda:
+            # Pinned host memory lets these uploads run asynchronously on the copy engine.
+            device_images = buffers.get("images", image_shape, torch.uint8, device)
+            device_masks = buffers.get("masks", mask_shape, torch.uint8, device)
+            device_images.copy_(host_images, non_blocking=True)
+            device_masks.copy_(host_masks, non_blocking=True)
+
+        image_input = buffers.get("image_input", (count, 3, height, width), torch.float32, device)
+        mask_input = buffers.get("mask_input", (count, 1, height, width), torch.float32, device)
+        image_input.copy_(device_images.permute(0, 3, 1, 2)).div_(255)
+        mask_input.copy_(device_masks.unsqueeze(1) > 0)
+
+        with _autocast(device):
+            result = network(image_input, mask_input)
+
+        output = buffers.get("output", image_shape, torch.uint8, device)
+        output.copy_(result.permute(0, 2, 3, 1).float().clamp_(0, 1).mul_(255))
+        if on_cuda:
+            host_output = buffers.get("host_output", image_shape, torch.uint8, "cpu", True)
+            output = host_output.copy_(output)
+        output_np = output.numpy()
+
+        # Copy the crops out: the buffers are overwritten by the next batch.
+        return [
+            output_np[index, : image.shape[0], : image.shape[1]].copy()
+            for index, image in enumerate(images)
+        ]
+
+
 class LamaWatermarkRemover:
     def __init__(
         self,
         device: str = "cpu",
         model_factory: Optional[Callable[[str], object]] = None,
+        batch_size: int = LAMA_BATCH_SIZE,
     ) -> None:
         self._device = device
         self._model_factory = model_factory or _default_model_factory
+        self._batch_size = max(1, batch_size)
         self._model: Optional[Callable[[np.ndarray, np.ndarray], np.ndarray]] = None
         self._lock = threading.Lock()
+        self._buffers = _InferenceBuffers()
 
     def _ensure_model(self) -> Callable[[np.ndarray, np.ndarray], np.ndarray]:
         if self._model is None:
@@ -61,25 +306,111 @@ class LamaWatermarkRemover:
                     self._model = self._model_factory(self._device)
         return self._model
 
-    def inpaint(self, image: Image.Image, mask: Image.Image) -> Image.Image:
+    def warm_up(self, size: int = 64) -> None:
+        # Loads the weights and runs one small pass so cuDNN autotuning happens up front.
+        image = np.zeros((size, size, 3), dtype=np.uint8)
+        mask = np.zeros((size, size), dtype=np.uint8)
+        mask[size // 4 : -size // 4, size // 4 : -size // 4] = 255
+        self.inpaint(image, mask)
+
+    def inpaint(self, image: ImageLike, mask: MaskLike) -> np.ndarray:
+        return self.inpaint_batch([image], [mask])[0]
+
+    def inpaint_batch(
+        self, images: Sequence[ImageLike], masks: Sequence[MaskLike]
+    ) -> List[np.ndarray]:
+        results = [_rgb_array(image) for image in images]
+        np_masks = [_mask_array(mask) for mask in masks]
+        pending = [index for index, mask in enumerate(np_masks) if mask.any()]
+        if not pending:
+            return results
+
+        # One writable copy per image; the inpainted crop is pasted back into it.
+        np_images = {index: np.array(results[index]) for index in pending}
+        crops = [_crop_with_context(np_images[index], np_masks[index]) for index in pending]
+        inpainted = self._run_model([crop for crop, _, _ in crops], [mask for _, mask, _ in crops])
+        for index, patch, (_, mask, bbox) in zip(pending, inpainted, crops):
+            results[index] = _paste(np_images[index], patch, mask, bbox)
+        return results
+
+    def _run_model(
+        self, images: Sequence[np.ndarray], masks: Sequence[np.ndarray]
+    ) -> List[np.ndarray]:
         model = self._ensure_model()
-        np_image = np.array(image.convert("RGB"))
-        np_mask = np.array(mask.convert("L"))
-        result = model(np_image, np_mask)
-        if isinstance(result, Image.Image):
-            return result
-        return Image.fromarray(result)
+
+        # SimpleLama exposes its torch network as ``model``; anything else is called per image.
+        network = getattr(model, "model", None)
+        device = getattr(model, "device", self._device)
+        if network is None:
+            with _autocast(device):
+                return [np.asarray(model(image, mask)) for image, mask in zip(images, masks)]
+
+        results: List[np.ndarray] = []
+        for start in range(0, len(images), self._batch_size):
+            end = start + self._batch_size
+            results.extend(
+                _forward_batch(network, device, images[start:end], masks[start:end], self._buffers)
+            )
+        return results
+
+
+def _decode_rgb(data: bytes) -> np.ndarray:
+    # Parse only the header first: PIL refuses decompression bombs (over twice
+    # Image.MAX_IMAGE_PIXELS) here, whereas OpenCV would allocate up to 2**30 pixels.
+    try:
+        image = Image.open(io.BytesIO(data))
+    except Image.DecompressionBombError as exc:
+        raise WatermarkRemovalError(f"Image is too large to process: {exc}") from exc
+    except OSError:
+        image = None
+
+    if cv2 is not None:
+        # Ignore EXIF orientation to decode exactly like PIL does.
+        flags = cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION
+        bgr = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flags)
+        if bgr is not None:
+            return cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+    # Formats OpenCV cannot read (e.g. GIF) still go through PIL. Decode eagerly here, on the
+    # executor thread, rather than lazily wherever the pixels are first touched.
+    if image is None:
+        image = Image.open(io.BytesIO(data))
+    image.load()
+    return _rgb_array(image)
+
+
+def create_http_client(timeout: float = 10.0) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+        timeout=timeout,
+        follow_redirects=True,
+    )
 
 
-async def fetch_image(url: str, timeout: float = 10.0, max_retries: int = 3) -> Image.Image:
+async def _get(client: Optional[httpx.AsyncClient], url: str, timeout: float) -> httpx.Response:
+    if client is not None:
+        return await client.get(url)
+    async with httpx.AsyncClient(timeout=timeout, follow_redirects=True) as one_off_client:
+        return await one_off_client.get(url)
+
+
+async def fetch_image(
+    url: str,
+    timeout: float = 10.0,
+    max_retries: int = 3,
+    client: Optional[httpx.AsyncClient] = None,
+) -> np.ndarray:
     last_exception = None
     
     for attempt in range(max_retries):
         try:
-            async with httpx.AsyncClient(timeout=timeout, follow_redirects=True) as client:
-                response = await client.get(url)
-                response.raise_for_status()
-                return Image.open(io.BytesIO(response.content)).convert("RGB")
+            response = await _get(client, url, timeout)
+            response.raise_for_status()
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, _decode_rgb, response.content)
+        except WatermarkRemovalError:
+            # Rejected content will not change on a retry.
+            raise
         except Exception as exc:
             last_exception = exc
             if attempt < max_retries - 1:
@@ -89,34 +420,225 @@ async def fetch_image(url: str, timeout: float = 10.0, max_retries: int = 3) ->
     raise last_exception
 
 
-def image_to_base64(image: Image.Image, format: str = "PNG") -> str:
-    buffer = io.BytesIO()
-    image.save(buffer, format=format)
-    return base64.b64encode(buffer.getvalue()).decode("utf-8")
-
+def _encode(image: ImageLike, format: str) -> bytes:
+    cv2_options = _CV2_ENCODE_OPTIONS.get(format)
+    if cv2_options is not None and (isinstance(image, np.ndarray) or image.mode == "RGB"):
+        extension, params = cv2_options
+        bgr = cv2.cvtColor(_rgb_array(image), cv2.COLOR_RGB2BGR)
+        ok, encoded = cv2.imencode(extension, bgr, params)
+        if ok:
+            return encoded.tobytes()
 
-def image_to_bytes(image: Image.Image, format: str = "PNG") -> bytes:
     buffer = io.BytesIO()
-    image.save(buffer, format=format)
+    _as_pil(image).save(buffer, format=format, **_SAVE_OPTIONS.get(format, {}))
     return buffer.getvalue()
 
 
-async def remove_watermark_from_url(
-    url: str,
-    region: WatermarkRegion,
-    remover: LamaWatermarkRemover,
-) -> Image.Image:
+def bytes_to_base64(data: bytes) -> str:
+    return _b64.b64encode(data).decode("ascii")
+
+
+def image_to_base64(image: ImageLike, format: str = "PNG") -> str:
+    return bytes_to_base64(image_to_bytes(image, format=format))
+
+
+_encode_cache: LRUCache = LRUCache(maxsize=ENCODE_CACHE_BYTES, getsizeof=len)
+_encode_cache_lock = threading.Lock()
+
+
+def image_to_bytes(image: ImageLike, format: str = "PNG") -> bytes:
+    format = format.upper()
+    pixels = np.ascontiguousarray(image if isinstance(image, np.ndarray) else np.asarray(image))
+    key = (xxhash.xxh3_64_intdigest(pixels), pixels.shape, pixels.dtype.str, format)
+    with _encode_cache_lock:
+        cached = _encode_cache.get(key)
+    if cached is not None:
+        return cached
+
+    encoded = _encode(image, format)
+    with _encode_cache_lock:
+        # Entries larger than the whole budget are rejected by the cache; just skip them.
+        if len(encoded) <= _encode_cache.maxsize:
+            _encode_cache[key] = encoded
+    return encoded
+
+
+_worker_remover: Optional[LamaWatermarkRemover] = None
+
+
+def _init_worker_model(
+    device: str, model_factory: Optional[Callable[[str], object]] = None
+) -> None:
+    global _worker_remover
+
     try:
-        image = await fetch_image(url)
+        import torch
+    except ImportError:  # pragma: no cover - only fake models run without torch
+        pass
+    else:
+        # Parallelism comes from the worker processes; more intra-op threads would oversubscribe.
+        torch.set_num_threads(1)
+    if njit is not None:
+        import numba
+
+        # Same for Numba, which would otherwise size its pool to every core in every worker.
+        numba.set_num_threads(1)
+
+    _worker_remover = LamaWatermarkRemover(device=device, model_factory=model_factory)
+    _worker_remover._ensure_model()
+
+
+def worker_inpaint(crop_bytes: bytes, mask_bytes: bytes, hw: tuple[int, int]) -> bytes:
+    height, width = hw
+    crop = np.frombuffer(crop_bytes, dtype=np.uint8).reshape(height, width, 3)
+    mask = np.frombuffer(mask_bytes, dtype=np.uint8).reshape(height, width)
+    # The parent already cropped around the mask and pastes the patch back itself.
+    patch = _worker_remover._run_model([crop], [mask])[0]
+    return np.ascontiguousarray(patch[:height, :width]).tobytes()
+
+
+def worker_warm_up() -> int:
+    _worker_remover.warm_up()
+    return os.getpid()
+
+
+def create_inference_process_pool(
+    device: str, max_workers: int, model_factory: Optional[Callable[[str], object]] = None
+) -> ProcessPoolExecutor:
+    import multiprocessing
+
+    # Spawn rather than fork: forking a process that already runs threads (and maybe torch)
+    # can deadlock the children.
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker_model,
+        initargs=(device, model_factory),
+    )
+
+
+async def warm_up_process_pool(pool: ProcessPoolExecutor, max_workers: int) -> List[int]:
+    # Spawned pools start workers on demand, one per pending submit. Queue one warm-up per
+    # worker so every process loads LaMa now rather than inside a real request.
+    loop = asyncio.get_running_loop()
+    return await asyncio.gather(
+        *(loop.run_in_executor(pool, worker_warm_up) for _ in range(max_workers))
+    )
+
+
+async def _inpaint_in_processes(
+    pool: ProcessPoolExecutor, images: Sequence[np.ndarray], masks: Sequence[np.ndarray]
+) -> List[np.ndarray]:
+    loop = asyncio.get_running_loop()
+
+    async def inpaint(image: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        # Only the crop LaMa actually sees crosses the process boundary, as raw bytes plus
+        # shape (cheaper than pickled arrays); the full image never leaves this process.
+        crop, crop_mask, bbox = _crop_with_context(image, mask)
+        patch = await loop.run_in_executor(
+            pool, worker_inpaint, crop.tobytes(), crop_mask.tobytes(), crop.shape[:2]
+        )
+        patch = np.frombuffer(patch, dtype=np.uint8).reshape(crop.shape)
+        return await loop.run_in_executor(None, _paste, np.array(image), patch, crop_mask, bbox)
+
+    return await asyncio.gather(*(inpaint(image, mask) for image, mask in zip(images, masks)))
+
+
+async def download_image(url: str, client: Optional[httpx.AsyncClient] = None) -> np.ndarray:
+    try:
+        return await fetch_image(url, client=client)
     except Exception as exc:  # noqa: BLE001 - capture network/image errors
         raise WatermarkRemovalError(f"Failed to download image from {url}: {exc}") from exc
 
-    mask = create_mask(image.size, region)
+
+Download = tuple[int, Union[np.ndarray, WatermarkRemovalError]]
+
+
+async def download_images(
+    urls: Sequence[str], client: Optional[httpx.AsyncClient] = None
+) -> AsyncIterator[Download]:
+    # Yields (index, image or error) as each download settles, so callers can act on a
+    # failure right away. Closing the iterator early cancels the downloads still running.
+    semaphore = asyncio.Semaphore(FETCH_CONCURRENCY)
+
+    async def download(index: int, url: str) -> Download:
+        async with semaphore:
+            try:
+                return index, await download_image(url, client)
+            except WatermarkRemovalError as exc:
+                return index, exc
+
+    tasks = [asyncio.ensure_future(download(index, url)) for index, url in enumerate(urls)]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def inpaint_images(
+    urls: Sequence[str],
+    images: Sequence[np.ndarray],
+    region: WatermarkRegion,
+    remover: LamaWatermarkRemover,
+    executor: Optional[Executor] = None,
+) -> List[np.ndarray]:
+    cleaned_images = list(images)
+    pending = []
+    pending_masks = []
+    for index, image in enumerate(images):
+        mask = create_mask((image.shape[1], image.shape[0]), region)
+        if mask is not None:
+            pending.append(index)
+            pending_masks.append(mask)
+    if not pending:
+        return cleaned_images
+    pending_images = [images[index] for index in pending]
 
     loop = asyncio.get_event_loop()
     try:
-        cleaned_image = await loop.run_in_executor(None, remover.inpaint, image, mask)
+        if isinstance(executor, ProcessPoolExecutor):
+            inpainted = await _inpaint_in_processes(executor, pending_images, pending_masks)
+        else:
+            inpainted = await loop.run_in_executor(
+                executor, remover.inpaint_batch, pending_images, pending_masks
+            )
+    except BrokenProcessPool as exc:
+        # A worker died (OOM, segfault); this is a server fault, not a bad input.
+        raise InferenceUnavailableError(f"Inference workers crashed: {exc}") from exc
     except Exception as exc:  # noqa: BLE001 - propagate as domain error
-        raise WatermarkRemovalError(f"Failed to inpaint image from {url}: {exc}") from exc
+        pending_urls = ", ".join(urls[index] for index in pending)
+        raise WatermarkRemovalError(f"Failed to inpaint image from {pending_urls}: {exc}") from exc
+
+    for index, image in zip(pending, inpainted):
+        cleaned_images[index] = image
+    return cleaned_images
 
-    return cleaned_image
+
+async def remove_watermark_from_urls(
+    urls: Sequence[str],
+    region: WatermarkRegion,
+    remover: LamaWatermarkRemover,
+    client: Optional[httpx.AsyncClient] = None,
+    executor: Optional[Executor] = None,
+) -> List[np.ndarray]:
+    images: List[np.ndarray] = [None] * len(urls)
+    # The first failed download fails the whole batch; leaving the loop cancels the rest.
+    async with contextlib.aclosing(download_images(urls, client)) as downloads:
+        async for index, image in downloads:
+            if isinstance(image, WatermarkRemovalError):
+                raise image
+            images[index] = image
+    return await inpaint_images(urls, images, region, remover, executor)
+
+
+async def remove_watermark_from_url(
+    url: str,
+    region: WatermarkRegion,
+    remover: LamaWatermarkRemover,
+    client: Optional[httpx.AsyncClient] = None,
+    executor: Optional[Executor] = None,
+) -> np.ndarray:
+    cleaned_images = await remove_watermark_from_urls([url], region, remover, client, executor)
+    return cleaned_images[0]
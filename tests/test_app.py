@@ -1,15 +1,26 @@
 from __future__ import annotations
 
+import asyncio
 import io
+import struct
 import zipfile
-from typing import Any
+from typing import Any, AsyncIterator, Callable, List, Tuple
 
+import httpx
+import numpy as np
 import pytest
 from fastapi.testclient import TestClient
 from PIL import Image
 
 from app.main import app
-from app.services import image_to_base64, image_to_bytes
+from app.models import WatermarkRegion
+from app.services import (
+    LamaWatermarkRemover,
+    create_mask,
+    fetch_image,
+    image_to_base64,
+    image_to_bytes,
+)
 
 
 client = TestClient(app)
@@ -17,21 +28,36 @@ client = TestClient(app)
 
 @pytest.fixture(autouse=True)
 def reset_cache():
-    # Ensure cached removers do not leak between tests
-    from app.main import _remover_for_device
+    # Ensure cached removers and results do not leak between tests
+    from app.main import _clear_result_cache, _remover_for_device
 
     _remover_for_device.cache_clear()
+    _clear_result_cache()
     yield
     _remover_for_device.cache_clear()
+    _clear_result_cache()
 
 
-def test_remove_watermark_single_image(monkeypatch: pytest.MonkeyPatch) -> None:
-    sample_image = Image.new("RGB", (2, 2), color=(255, 0, 0))
+def _serve_images(monkeypatch: pytest.MonkeyPatch, image_for_url: Callable[[str], Any]) -> List:
+    # Stands in for downloading and inpainting; returns the URL batches that were "downloaded".
+    calls = []
+
+    async def fake_download(urls: List[str], client: Any = None) -> AsyncIterator[Any]:
+        calls.append(urls)
+        for index, url in enumerate(urls):
+            yield index, image_for_url(url)
 
-    async def fake_remove(url: str, region: Any, remover: Any) -> Image.Image:
-        return sample_image
+    async def fake_inpaint(urls: List[str], images: List[Any], *args: Any) -> List[Any]:
+        return images
 
-    monkeypatch.setattr("app.main.remove_watermark_from_url", fake_remove)
+    monkeypatch.setattr("app.main.download_images", fake_download)
+    monkeypatch.setattr("app.main.inpaint_images", fake_inpaint)
+    return calls
+
+
+def test_remove_watermark_single_image(monkeypatch: pytest.MonkeyPatch) -> None:
+    sample_image = Image.new("RGB", (2, 2), color=(255, 0, 0))
+    _serve_images(monkeypatch, lambda url: sample_image)
 
     response = client.post(
         "/v1/remove-watermark",
@@ -41,16 +67,108 @@ def test_remove_watermark_single_image(monkeypatch: pytest.MonkeyPatch) -> None:
     assert response.status_code == 200
     payload = response.json()
     assert payload["results"][0]["source_url"] == "https://example.com/image.jpg"
-    assert payload["results"][0]["cleaned_image_base64"] == image_to_base64(sample_image)
+    assert payload["results"][0]["cleaned_image_base64"] == image_to_base64(
+        sample_image, format="jpeg"
+    )
+
+
+def test_remove_watermark_processes_duplicate_urls_once(monkeypatch: pytest.MonkeyPatch) -> None:
+    sample_image = Image.new("RGB", (2, 2), color=(255, 0, 0))
+    calls = _serve_images(monkeypatch, lambda url: sample_image)
+
+    response = client.post(
+        "/v1/remove-watermark",
+        json={"images": ["https://example.com/a.jpg", "https://example.com/a.jpg"]},
+    )
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert len(results) == 2
+    assert results[0]["cleaned_image_base64"] == results[1]["cleaned_image_base64"]
+    assert calls == [["https://example.com/a.jpg"]]
+
+
+def _serve_slowly(monkeypatch: pytest.MonkeyPatch) -> Tuple[List, asyncio.Event]:
+    # Downloads of "bad" URLs fail at once; the others wait until the event is set.
+    from app.services import WatermarkRemovalError
+
+    inpainted = []
+    release = asyncio.Event()
+
+    async def fake_download(urls: List[str], client: Any = None) -> AsyncIterator[Any]:
+        for index, url in enumerate(urls):
+            if "bad" in url:
+                yield index, WatermarkRemovalError(f"Failed to download {url}")
+        await release.wait()
+        for index, url in enumerate(urls):
+            if "bad" not in url:
+                yield index, np.zeros((2, 2, 3), dtype=np.uint8)
+
+    async def fake_inpaint(urls: List[str], images: List[Any], *args: Any) -> List[Any]:
+        inpainted.extend(urls)
+        return images
+
+    monkeypatch.setattr("app.main.download_images", fake_download)
+    monkeypatch.setattr("app.main.inpaint_images", fake_inpaint)
+    return inpainted, release
+
+
+def test_concurrent_requests_only_fail_on_their_own_urls(monkeypatch: pytest.MonkeyPatch) -> None:
+    from app.main import _cleaned_bytes
+    from app.services import WatermarkRemovalError
+
+    inpainted, release = _serve_slowly(monkeypatch)
+    region = WatermarkRegion(width=1, height=1)
+
+    async def run() -> List[Any]:
+        first = asyncio.ensure_future(
+            _cleaned_bytes(["http://x/good", "http://x/bad"], region, None, "cpu", "png")
+        )
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(
+            _cleaned_bytes(["http://x/good"], region, None, "cpu", "png")
+        )
+        await asyncio.wait([first])
+        release.set()
+        return await asyncio.gather(first, second, return_exceptions=True)
+
+    first, second = asyncio.run(run())
+
+    assert isinstance(first, WatermarkRemovalError)
+    assert "http://x/bad" in str(first)
+    assert second == [image_to_bytes(np.zeros((2, 2, 3), dtype=np.uint8))]
+    assert inpainted == ["http://x/good"]
+
+
+def test_failed_download_fails_request_before_inference(monkeypatch: pytest.MonkeyPatch) -> None:
+    from app.main import _batches, _cleaned_bytes, _inflight
+    from app.services import WatermarkRemovalError
+
+    inpainted, release = _serve_slowly(monkeypatch)
+    region = WatermarkRegion(width=1, height=1)
+
+    async def run() -> None:
+        # The request fails while the good URL is still downloading.
+        with pytest.raises(WatermarkRemovalError, match="http://x/bad"):
+            await _cleaned_bytes(["http://x/good", "http://x/bad"], region, None, "cpu", "png")
+        release.set()
+        await asyncio.gather(*_batches)
+
+    asyncio.run(run())
+
+    # Nobody else wanted the good URL, so it was never inpainted.
+    assert inpainted == []
+    assert _inflight == {}
 
 
 def test_remove_watermark_handles_service_error(monkeypatch: pytest.MonkeyPatch) -> None:
     from app.services import WatermarkRemovalError
 
-    async def fake_remove(url: str, region: Any, remover: Any) -> Image.Image:
+    async def fake_inpaint(*args: Any) -> List[Image.Image]:
         raise WatermarkRemovalError("boom")
 
-    monkeypatch.setattr("app.main.remove_watermark_from_url", fake_remove)
+    _serve_images(monkeypatch, lambda url: Image.new("RGB", (2, 2)))
+    monkeypatch.setattr("app.main.inpaint_images", fake_inpaint)
 
     response = client.post(
         "/v1/remove-watermark",
@@ -61,6 +179,33 @@ def test_remove_watermark_handles_service_error(monkeypatch: pytest.MonkeyPatch)
     assert response.json()["detail"] == "boom"
 
 
+def test_remove_watermark_replaces_crashed_process_pool(monkeypatch: pytest.MonkeyPatch) -> None:
+    from concurrent.futures import ProcessPoolExecutor
+
+    from app.services import InferenceUnavailableError
+
+    broken_pool = ProcessPoolExecutor(max_workers=1)
+    fresh_pool = ProcessPoolExecutor(max_workers=1)
+
+    async def fake_inpaint(*args: Any) -> List[Image.Image]:
+        raise InferenceUnavailableError("Inference workers crashed")
+
+    _serve_images(monkeypatch, lambda url: Image.new("RGB", (2, 2)))
+    monkeypatch.setattr("app.main.inpaint_images", fake_inpaint)
+    monkeypatch.setattr("app.main.create_inference_process_pool", lambda device, workers: fresh_pool)
+    monkeypatch.setattr("app.main.LAMA_PREWARM", False)
+    monkeypatch.setattr(app.state, "cpu_process_pool", broken_pool, raising=False)
+
+    response = client.post(
+        "/v1/remove-watermark",
+        json={"images": "https://example.com/a.jpg", "device": "cpu"},
+    )
+    fresh_pool.shutdown()
+
+    assert response.status_code == 503
+    assert app.state.cpu_process_pool is fresh_pool
+
+
 def test_remove_watermark_rejects_empty_list() -> None:
     response = client.post("/v1/remove-watermark", json={"images": []})
     assert response.status_code == 422
@@ -68,11 +213,7 @@ def test_remove_watermark_rejects_empty_list() -> None:
 
 def test_remove_watermark_returns_file_when_requested(monkeypatch: pytest.MonkeyPatch) -> None:
     sample_image = Image.new("RGB", (3, 3), color=(0, 255, 0))
-
-    async def fake_remove(url: str, region: Any, remover: Any) -> Image.Image:
-        return sample_image
-
-    monkeypatch.setattr("app.main.remove_watermark_from_url", fake_remove)
+    _serve_images(monkeypatch, lambda url: sample_image)
 
     response = client.post(
         "/v1/remove-watermark",
@@ -85,17 +226,31 @@ def test_remove_watermark_returns_file_when_requested(monkeypatch: pytest.Monkey
     assert response.content == image_to_bytes(sample_image)
 
 
+def test_remove_watermark_returns_requested_file_format(monkeypatch: pytest.MonkeyPatch) -> None:
+    sample_image = Image.new("RGB", (3, 3), color=(0, 255, 0))
+    _serve_images(monkeypatch, lambda url: sample_image)
+
+    response = client.post(
+        "/v1/remove-watermark",
+        json={
+            "images": "https://example.com/image.jpg",
+            "response_format": "file",
+            "image_format": "webp",
+        },
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("image/webp")
+    assert "attachment; filename=cleaned.webp" in response.headers["content-disposition"]
+    assert Image.open(io.BytesIO(response.content)).format == "WEBP"
+
+
 def test_remove_watermark_returns_zip_for_multiple_files(monkeypatch: pytest.MonkeyPatch) -> None:
     images = [
         Image.new("RGB", (4, 4), color=(0, 0, 255)),
         Image.new("RGB", (5, 5), color=(255, 255, 0)),
     ]
-    iterator = iter(images)
-
-    async def fake_remove(url: str, region: Any, remover: Any) -> Image.Image:
-        return next(iterator)
-
-    monkeypatch.setattr("app.main.remove_watermark_from_url", fake_remove)
+    _serve_images(monkeypatch, lambda url: images[url.endswith("b.jpg")])
 
     response = client.post(
         "/v1/remove-watermark",
@@ -109,9 +264,355 @@ def test_remove_watermark_returns_zip_for_multiple_files(monkeypatch: pytest.Mon
     assert response.headers["content-type"] == "application/zip"
     assert "attachment; filename=cleaned_images.zip" in response.headers["content-disposition"]
 
+    # Entries carry their sizes in the local header rather than a trailing data descriptor,
+    # which streaming readers reject for stored entries.
+    flag_bits, method = struct.unpack("<HH", response.content[6:10])
+    compressed_size, file_size = struct.unpack("<II", response.content[18:26])
+    assert flag_bits & 0x08 == 0
+    assert method == zipfile.ZIP_STORED
+    assert compressed_size == file_size == len(image_to_bytes(images[0]))
+
     with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
         assert sorted(archive.namelist()) == ["cleaned_1.png", "cleaned_2.png"]
         for idx, expected in enumerate(images, start=1):
             with archive.open(f"cleaned_{idx}.png") as member:
                 data = member.read()
                 assert data == image_to_bytes(expected)
+
+
+def test_image_to_bytes_round_trips_png() -> None:
+    sample_image = Image.new("RGB", (6, 4), color=(10, 20, 30))
+    sample_image.putpixel((1, 2), (200, 100, 50))
+
+    decoded = Image.open(io.BytesIO(image_to_bytes(sample_image)))
+
+    assert decoded.format == "PNG"
+    assert decoded.convert("RGB").tobytes() == sample_image.tobytes()
+    assert image_to_bytes(np.asarray(sample_image)) == image_to_bytes(sample_image)
+
+
+def test_image_to_bytes_reuses_encoding_for_identical_pixels(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    from app import services
+
+    calls = []
+    original_encode = services._encode
+
+    def counting_encode(image: Any, format: str) -> bytes:
+        calls.append(format)
+        return original_encode(image, format)
+
+    monkeypatch.setattr(services, "_encode", counting_encode)
+    encode_cache = services.LRUCache(maxsize=1 << 20, getsizeof=len)
+    monkeypatch.setattr(services, "_encode_cache", encode_cache)
+    pixels = np.full((3, 3, 3), 42, dtype=np.uint8)
+
+    first = image_to_bytes(pixels, format="png")
+    second = image_to_bytes(pixels.copy(), format="png")
+    image_to_bytes(pixels, format="jpeg")
+
+    assert first == second
+    assert calls == ["PNG", "JPEG"]
+
+
+def test_inpaint_batch_preserves_order_and_sizes() -> None:
+    def fake_model(image: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        assert image.shape[:2] == mask.shape
+        return np.full_like(image, mask.shape[1])
+
+    remover = LamaWatermarkRemover(model_factory=lambda device: fake_model)
+    images = [Image.new("RGB", (4, 3)), Image.new("RGB", (7, 5))]
+    masks = [Image.new("L", image.size, color=255) for image in images]
+
+    results = remover.inpaint_batch(images, masks)
+
+    assert [result.shape for result in results] == [(3, 4, 3), (5, 7, 3)]
+    assert [tuple(result[0, 0]) for result in results] == [(4, 4, 4), (7, 7, 7)]
+
+
+def test_inpaint_only_runs_model_on_region_with_context() -> None:
+    seen_shapes = []
+
+    def fake_model(image: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        seen_shapes.append(image.shape[:2])
+        return np.full_like(image, 9)
+
+    remover = LamaWatermarkRemover(model_factory=lambda device: fake_model)
+    image = Image.new("RGB", (600, 500), color=(1, 1, 1))
+    mask = create_mask(image.size, WatermarkRegion(width=10, height=10))
+
+    result = remover.inpaint(image, mask)
+
+    assert seen_shapes == [(272, 272)]
+    assert (result[490:, 590:] == 9).all()
+    assert (result[:490] == 1).all()
+    assert (result[:, :590] == 1).all()
+
+
+def test_batched_forward_reuses_inference_buffers() -> None:
+    torch = pytest.importorskip("torch")
+
+    class FakeNetwork(torch.nn.Module):
+        def forward(self, image: Any, mask: Any) -> Any:
+            return image * (1 - mask) + 0.5 * mask
+
+    class FakeLama:
+        model = FakeNetwork()
+        device = "cpu"
+
+    remover = LamaWatermarkRemover(model_factory=lambda device: FakeLama())
+    region = WatermarkRegion(width=4, height=4)
+    images = [np.full((30, 20, 3), 200, dtype=np.uint8), np.full((17, 41, 3), 10, dtype=np.uint8)]
+    masks = [create_mask((image.shape[1], image.shape[0]), region) for image in images]
+
+    first = remover.inpaint_batch(images, masks)
+    buffer_ids = {name: id(buffer) for name, buffer in remover._buffers._buffers.items()}
+    second = remover.inpaint_batch(images[:1], masks[:1])
+
+    assert [result.shape for result in first] == [(30, 20, 3), (17, 41, 3)]
+    assert tuple(first[0][-1, -1]) == (127, 127, 127)
+    assert tuple(first[1][0, 0]) == (10, 10, 10)
+    np.testing.assert_array_equal(second[0], first[0])
+    assert {name: id(buffer) for name, buffer in remover._buffers._buffers.items()} == buffer_ids
+
+
+def test_batched_forward_does_not_mirror_masks_past_their_own_padding() -> None:
+    torch = pytest.importorskip("torch")
+    from app.services import _forward_batch, _InferenceBuffers
+
+    masked_pixels = []
+
+    class FakeNetwork(torch.nn.Module):
+        def forward(self, image: Any, mask: Any) -> Any:
+            masked_pixels.extend(int(count) for count in mask.sum(dim=(1, 2, 3)))
+            return image
+
+    images = [np.zeros((12, 10, 3), dtype=np.uint8), np.zeros((40, 40, 3), dtype=np.uint8)]
+    masks = [np.zeros((12, 10), dtype=np.uint8), np.zeros((40, 40), dtype=np.uint8)]
+    masks[0][8:, 6:] = 255
+
+    _forward_batch(FakeNetwork(), "cpu", images, masks, _InferenceBuffers())
+
+    # The 4x4 corner is mirrored once to reach 16x16, exactly as if it were inpainted alone.
+    assert masked_pixels == [64, 0]
+
+
+def test_warm_up_runs_one_small_inpaint() -> None:
+    calls = []
+
+    def fake_model(image: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        calls.append((image.shape, int(mask.max())))
+        return image
+
+    LamaWatermarkRemover(model_factory=lambda device: fake_model).warm_up()
+
+    assert calls == [((64, 64, 3), 255)]
+
+
+def test_process_inpaint_ships_only_the_crop(monkeypatch: pytest.MonkeyPatch) -> None:
+    from concurrent.futures import ThreadPoolExecutor
+
+    from app import services
+    from app.services import _init_worker_model, _inpaint_in_processes
+
+    # The initializer sets process-wide state meant for pool workers; keep it out of this process.
+    monkeypatch.setattr(services, "_worker_remover", None)
+    try:
+        import torch
+    except ImportError:
+        pass
+    else:
+        monkeypatch.setattr(torch, "set_num_threads", lambda threads: None)
+    numba_threads: List[int] = []
+    try:
+        import numba
+    except ImportError:
+        numba = None
+    else:
+        monkeypatch.setattr(numba, "set_num_threads", numba_threads.append)
+
+    seen_shapes = []
+
+    def fake_model(image: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        seen_shapes.append(image.shape)
+        return np.full_like(image, 5)
+
+    _init_worker_model("cpu", lambda device: fake_model)
+    image = np.zeros((500, 600, 3), dtype=np.uint8)
+    mask = create_mask((600, 500), WatermarkRegion(width=10, height=10))
+
+    # Threads stand in for the worker processes; the bytes crossing over are the same.
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        [result] = asyncio.run(_inpaint_in_processes(pool, [image], [mask]))
+
+    assert seen_shapes == [(272, 272, 3)]
+    assert result.shape == image.shape
+    assert (result[490:, 590:] == 5).all()
+    assert (result[:490] == 0).all()
+    assert (result[:, :590] == 0).all()
+    assert (image == 0).all()
+    assert numba_threads == ([] if numba is None else [1])
+
+
+def _barrier_model_factory(barrier: Any, device: str) -> Any:
+    def model(image: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        # Returns only once another worker is warming up at the same time.
+        barrier.wait()
+        return image
+
+    return model
+
+
+def test_warm_up_process_pool_warms_every_worker() -> None:
+    import functools
+    import multiprocessing
+
+    from app.services import create_inference_process_pool, warm_up_process_pool
+
+    # The barrier reaches the workers through the pool initializer's arguments.
+    barrier = multiprocessing.get_context("spawn").Barrier(2, timeout=60)
+    factory = functools.partial(_barrier_model_factory, barrier)
+    pool = create_inference_process_pool("cpu", 2, model_factory=factory)
+    try:
+        pids = asyncio.run(warm_up_process_pool(pool, 2))
+    finally:
+        pool.shutdown()
+
+    assert len(set(pids)) == 2
+
+
+def test_remove_watermark_from_urls_reports_broken_pool(monkeypatch: pytest.MonkeyPatch) -> None:
+    from concurrent.futures import ProcessPoolExecutor
+    from concurrent.futures.process import BrokenProcessPool
+
+    from app.services import InferenceUnavailableError, remove_watermark_from_urls
+
+    async def fake_fetch(url: str, client: Any = None) -> np.ndarray:
+        return np.zeros((4, 4, 3), dtype=np.uint8)
+
+    async def crashed(pool: Any, images: Any, masks: Any) -> List[np.ndarray]:
+        raise BrokenProcessPool("worker died")
+
+    monkeypatch.setattr("app.services.fetch_image", fake_fetch)
+    monkeypatch.setattr("app.services._inpaint_in_processes", crashed)
+    pool = ProcessPoolExecutor(max_workers=1)
+    remover = LamaWatermarkRemover(model_factory=lambda device: None)
+
+    try:
+        with pytest.raises(InferenceUnavailableError):
+            asyncio.run(
+                remove_watermark_from_urls(
+                    ["https://example.com/a.jpg"],
+                    WatermarkRegion(width=1, height=1),
+                    remover,
+                    executor=pool,
+                )
+            )
+    finally:
+        pool.shutdown()
+
+
+def test_create_mask_marks_bottom_right_region() -> None:
+    mask = create_mask((10, 8), WatermarkRegion(width=3, height=2, offset_x=1, offset_y=1))
+
+    assert mask.shape == (8, 10)
+    assert mask.dtype == np.uint8
+    expected = np.zeros((8, 10), dtype=np.uint8)
+    expected[5:7, 6:9] = 255
+    np.testing.assert_array_equal(mask, expected)
+
+
+def test_create_mask_returns_none_outside_image() -> None:
+    assert create_mask((10, 8), WatermarkRegion(width=3, height=2, offset_x=10)) is None
+    assert create_mask((10, 8), WatermarkRegion(width=3, height=2, offset_y=12)) is None
+
+
+def test_inpaint_skips_model_for_empty_mask() -> None:
+    def fake_model(image: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        raise AssertionError("model should not run")
+
+    remover = LamaWatermarkRemover(model_factory=lambda device: fake_model)
+    image = np.full((4, 4, 3), 7, dtype=np.uint8)
+
+    result = remover.inpaint(image, np.zeros((4, 4), dtype=np.uint8))
+
+    np.testing.assert_array_equal(result, image)
+
+
+def test_fetch_image_reuses_supplied_client() -> None:
+    sample_image = Image.new("RGB", (3, 2), color=(1, 2, 3))
+    requested = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requested.append(str(request.url))
+        return httpx.Response(200, content=image_to_bytes(sample_image))
+
+    async def run() -> np.ndarray:
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http_client:
+            return await fetch_image("https://example.com/a.png", client=http_client)
+
+    image = asyncio.run(run())
+
+    assert requested == ["https://example.com/a.png"]
+    np.testing.assert_array_equal(image, np.asarray(sample_image))
+
+
+def test_remove_watermark_from_urls_reports_download_failure(monkeypatch: pytest.MonkeyPatch) -> None:
+    from app.services import WatermarkRemovalError, remove_watermark_from_urls
+
+    async def fake_fetch(url: str, client: Any = None) -> np.ndarray:
+        raise httpx.ConnectError("unreachable")
+
+    monkeypatch.setattr("app.services.fetch_image", fake_fetch)
+    remover = LamaWatermarkRemover(model_factory=lambda device: None)
+
+    with pytest.raises(WatermarkRemovalError, match="Failed to download image"):
+        asyncio.run(
+            remove_watermark_from_urls(
+                ["https://example.com/a.jpg", "https://example.com/b.jpg"],
+                WatermarkRegion(width=1, height=1),
+                remover,
+            )
+        )
+
+
+def test_decode_rgb_handles_formats_opencv_cannot_read() -> None:
+    from app.services import _decode_rgb
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (3, 3), color=(255, 0, 0)).save(buffer, format="GIF")
+
+    decoded = _decode_rgb(buffer.getvalue())
+
+    assert decoded.shape == (3, 3, 3)
+    assert tuple(decoded[0, 0]) == (255, 0, 0)
+
+
+def test_blend_kernels_agree() -> None:
+    from app.services import _blend_numpy, _feather_blend
+
+    rng = np.random.default_rng(0)
+    orig = rng.integers(0, 256, size=(6, 5, 3), dtype=np.uint8)
+    inpainted = rng.integers(0, 256, size=(6, 5, 3), dtype=np.uint8)
+    mask = rng.integers(0, 256, size=(6, 5), dtype=np.uint8)
+    mask[0] = 0
+    mask[1] = 255
+
+    expected = np.empty_like(orig)
+    _blend_numpy(orig, inpainted, mask, expected)
+    out = np.empty_like(orig)
+    _feather_blend(orig, inpainted, mask, out)
+
+    np.testing.assert_allclose(out, expected, atol=1)
+    np.testing.assert_array_equal(out[0], orig[0])
+    np.testing.assert_array_equal(out[1], inpainted[1])
+
+
+def test_decode_rgb_rejects_decompression_bombs(monkeypatch: pytest.MonkeyPatch) -> None:
+    from app.services import WatermarkRemovalError, _decode_rgb
+
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 10)
+
+    with pytest.raises(WatermarkRemovalError, match="too large"):
+        _decode_rgb(image_to_bytes(np.zeros((5, 5, 3), dtype=np.uint8)))